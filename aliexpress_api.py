@@ -11,16 +11,105 @@ import logging
 import hashlib
 import time
 import json
-from typing import Optional, Dict, Any
+from dataclasses import dataclass
+from urllib.parse import urlencode
+from typing import Optional, Dict, Any, Iterable, Final, List
 import aiohttp
 import asyncio
+import numpy as np
+from cachetools import TTLCache
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional, fall back to stdlib json
+    _json_loads = json.loads
+
+try:
+    import numba
+except ImportError:  # numba is optional, bulk pricing falls back to NumPy
+    numba = None
+
+# Batches smaller than this are cheaper in plain NumPy than in a threaded kernel
+_NUMBA_MIN_BATCH = 10_000
+
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _calc_total_price_kernel(base, ship, rate, out_sub, out_tax, out_total):
+        """Fused subtotal/tax/total pass over 1-D float64 arrays"""
+        for i in numba.prange(base.shape[0]):
+            subtotal = base[i] + ship[i]
+            tax_amount = subtotal * rate
+            out_sub[i] = subtotal
+            out_tax[i] = tax_amount
+            out_total[i] = subtotal + tax_amount
+else:
+    _calc_total_price_kernel = None
 
 logger = logging.getLogger(__name__)
 
+_FORM_HEADERS = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+# Top-level response keys for each API method
+PRODUCT_DETAIL_RESP: Final = 'aliexpress_affiliate_productdetail_get_response'
+SKU_DETAIL_RESP: Final = 'aliexpress_affiliate_product_sku_detail_get_response'
+SHIPPING_RESP: Final = 'aliexpress_affiliate_product_shipping_get_response'
+PRODUCT_QUERY_RESP: Final = 'aliexpress_affiliate_product_query_response'
+
+_EMPTY: Final[Dict[str, Any]] = {}
+
+# One connection pool per process, shared by every AliExpressAPI instance
+_SESSION: Optional[aiohttp.ClientSession] = None
+
+# Product detail fields consumed by the formatter. Pass a wider set (e.g. with
+# 'ae_item_properties', 'logistics_info_dto', 'ae_multimedia_info_dto') to
+# get_product_details when those subtrees are needed.
+DEFAULT_PRODUCT_FIELDS = (
+    'product_id',
+    'product_title',
+    'product_main_image_url',
+    'ae_item_base_info_dto',
+    'ae_item_sku_info_dtos'
+)
+
+def _price_value(value: Any) -> float:
+    """Parse a numeric API field such as '12.50' or '96.5%' (NaN when missing)"""
+    if value is None:
+        return np.nan
+    if isinstance(value, str):
+        value = value[:-1] if value.endswith('%') else value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+@dataclass
+class ProductArrays:
+    """Structure-of-arrays view of a product list for vectorised filtering"""
+    products: List[Dict[str, Any]]
+    product_id: np.ndarray
+    sale_price: np.ndarray
+    original_price: np.ndarray
+    evaluate_rate: np.ndarray
+
+def products_to_soa(products: List[Dict[str, Any]]) -> ProductArrays:
+    """Convert `result['products']` from search responses into parallel arrays"""
+    count = len(products)
+    return ProductArrays(
+        products=products,
+        product_id=np.fromiter((int(p.get('product_id') or 0) for p in products), dtype=np.int64, count=count),
+        sale_price=np.fromiter((_price_value(p.get('target_sale_price', p.get('sale_price'))) for p in products),
+                               dtype=np.float64, count=count),
+        original_price=np.fromiter((_price_value(p.get('target_original_price', p.get('original_price'))) for p in products),
+                                   dtype=np.float64, count=count),
+        evaluate_rate=np.fromiter((_price_value(p.get('evaluate_rate')) for p in products), dtype=np.float64, count=count)
+    )
+
 class AliExpressAPI:
     def __init__(self):
         self.app_key = os.getenv('ALIEXPRESS_APP_KEY')
         self.app_secret = os.getenv('ALIEXPRESS_APP_SECRET')
+        self._secret_bytes = (self.app_secret or '').encode('utf-8')
 
         self.access_token = os.getenv('ALIEXPRESS_ACCESS_TOKEN')
         self.base_url = os.getenv('ALIEXPRESS_API_BASE_URL', 'https://api.aliexpress.com/sync')
@@ -32,63 +121,85 @@ class AliExpressAPI:
         self.ship_to_country = os.getenv('SHIP_TO_COUNTRY', 'DZ')
         self.tax_rate = float(os.getenv('TAX_RATE', '0.1'))
 
+        # Static request parameters, built once and copied per request
+        self._base_params = {
+            'app_key': self.app_key,
+            'format': 'json',
+            'v': '2.0',
+            'sign_method': 'md5',
+            'target_currency': self.target_currency,
+            'target_language': self.target_language,
+            'ship_to_country': self.ship_to_country
+        }
+        if self.access_token:
+            self._base_params['session'] = self.access_token
+        
+        # Sorted signing order per distinct parameter key set
+        self._sorted_key_cache: Dict[frozenset, tuple] = {}
         
-        self.session = None
+        # Short-lived cache of successful responses, keyed on method + params
+        self._response_cache = TTLCache(
+            maxsize=1024,
+            ttl=int(os.getenv('API_CACHE_TTL', '300'))
+        )
     
     async def _get_session(self):
-        """Get or create aiohttp session"""
-        if self.session is None or self.session.closed:
+        """Get or create the aiohttp session shared by all client instances"""
+        global _SESSION
+        if _SESSION is None or _SESSION.closed:
             timeout = aiohttp.ClientTimeout(total=30)
-            self.session = aiohttp.ClientSession(timeout=timeout)
-        return self.session
+            # Keep connections to the API host alive so TLS handshakes are reused
+            connector = aiohttp.TCPConnector(
+                limit=32,
+                limit_per_host=16,
+                ttl_dns_cache=300,
+                enable_cleanup_closed=True,
+                keepalive_timeout=60
+            )
+            _SESSION = aiohttp.ClientSession(
+                connector=connector,
+                timeout=timeout,
+                headers={'Accept-Encoding': 'gzip, deflate'}
+            )
+        return _SESSION
     
     async def close(self):
-        """Close the aiohttp session"""
-        if self.session and not self.session.closed:
-            await self.session.close()
+        """Close the shared aiohttp session"""
+        global _SESSION
+        if _SESSION and not _SESSION.closed:
+            await _SESSION.close()
+        _SESSION = None
     
     def _generate_signature(self, params: Dict[str, Any]) -> str:
         """Generate API signature for AliExpress API"""
-        # Sort parameters by key
-        sorted_params = sorted(params.items())
-        
-        # Create parameter string
-        param_string = ''.join([f"{k}{v}" for k, v in sorted_params])
-        
-        # Add app secret at the beginning and end
-        sign_string = f"{self.app_secret}{param_string}{self.app_secret}"
+        # Sign string is secret + sorted key/value pairs + secret, built as bytes
+        key_set = frozenset(params)
+        sorted_keys = self._sorted_key_cache.get(key_set)
+        if sorted_keys is None:
+            sorted_keys = self._sorted_key_cache[key_set] = tuple(sorted(key_set))
         
-        # Generate MD5 hash
-        signature = hashlib.md5(sign_string.encode('utf-8')).hexdigest().upper()
+        buf = bytearray(self._secret_bytes)
+        for k in sorted_keys:
+            buf += k.encode('utf-8')
+            buf += str(params[k]).encode('utf-8')
+        buf += self._secret_bytes
         
-        return signature
+        # MD5 is mandated by the API wire format and has no security role here
+        return hashlib.md5(buf, usedforsecurity=False).hexdigest().upper()
     
     def _prepare_common_params(self, method: str) -> Dict[str, Any]:
         """Prepare common API parameters"""
-        timestamp = str(int(time.time() * 1000))
-        
-        params = {
-            'app_key': self.app_key,
-            'method': method,
-            'timestamp': timestamp,
-            'format': 'json',
-            'v': '2.0',
-            'sign_method': 'md5',
-            'target_currency': self.target_currency,
-            'target_language': self.target_language,
-            'ship_to_country': self.ship_to_country
-        }
+        timestamp = str(time.time_ns() // 1_000_000)
         
-
-        if self.access_token:
-            params['session'] = self.access_token
-        
-
-
-        return params
+        return {**self._base_params, 'method': method, 'timestamp': timestamp}
     
     async def _make_api_request(self, method: str, additional_params: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
         """Make API request to AliExpress"""
+        cache_key = (method, tuple(sorted(additional_params.items())) if additional_params else ())
+        cached = self._response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             # Prepare parameters
             params = self._prepare_common_params(method)
@@ -99,32 +210,41 @@ class AliExpressAPI:
             # Generate signature
             params['sign'] = self._generate_signature(params)
             
+            # Encode the form body once instead of letting aiohttp rebuild it
+            body = urlencode(params).encode('ascii')
+            
             # Make request
             session = await self._get_session()
             
-            async with session.post(self.base_url, data=params) as response:
+            async with session.post(self.base_url, data=body, headers=_FORM_HEADERS) as response:
                 if response.status == 200:
-                    response_data = await response.json()
-                    logger.info(f"API request successful: {method}")
+                    response_data = await response.json(loads=_json_loads)
+                    logger.info("API request successful: %s", method)
+                    # The gateway also reports errors with HTTP 200 as {"error_response": ...};
+                    # only cache bodies that carry the method's own *_response key
+                    if method.replace('.', '_') + '_response' in response_data:
+                        self._response_cache[cache_key] = response_data
                     return response_data
                 else:
-                    logger.error(f"API request failed with status {response.status}")
-                    error_text = await response.text()
-                    logger.error(f"Error response: {error_text}")
+                    logger.error("API request failed with status %s", response.status)
+                    if logger.isEnabledFor(logging.ERROR):
+                        error_text = await response.text()
+                        logger.error("Error response: %s", error_text)
                     return None
                     
         except Exception as e:
-            logger.error(f"Error making API request: {e}")
+            logger.error("Error making API request: %s", e)
             return None
     
 
-    async def get_product_details(self, product_id: str, sku_id: str = None) -> Optional[Dict[str, Any]]:
-        """Get detailed product information"""
+    async def get_product_details(self, product_id: str, sku_id: str = None,
+                                  fields: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+        """Get detailed product information, limited to `fields` (DEFAULT_PRODUCT_FIELDS if omitted)"""
         try:
             # Prepare parameters for product detail API
             params = {
                 'product_ids': product_id,
-                'fields': 'product_id,product_title,product_main_image_url,product_video_url,ae_item_base_info_dto,ae_item_sku_info_dtos,ae_item_properties,logistics_info_dto,ae_multimedia_info_dto'
+                'fields': ','.join(fields or DEFAULT_PRODUCT_FIELDS)
             }
             
             # Call product detail API
@@ -137,24 +257,23 @@ class AliExpressAPI:
                 return None
             
             # Parse response
-            if 'aliexpress_affiliate_productdetail_get_response' in response:
-                result = response['aliexpress_affiliate_productdetail_get_response']['result']
-                
-                if result.get('products'):
-                    product_data = result['products'][0]
-                    
-                    # Get additional SKU details if SKU ID is provided
-                    if sku_id:
-                        sku_details = await self.get_sku_details(product_id, sku_id)
-                        if sku_details:
-                            product_data['sku_details'] = sku_details
-                    
-                    return product_data
+            products = response.get(PRODUCT_DETAIL_RESP, _EMPTY).get('result', _EMPTY).get('products')
+            if not products:
+                return None
             
-            return None
+            # Copy so SKU details are not written into the cached response
+            product_data = dict(products[0])
+            
+            # Get additional SKU details if SKU ID is provided
+            if sku_id:
+                sku_details = await self.get_sku_details(product_id, sku_id)
+                if sku_details:
+                    product_data['sku_details'] = sku_details
+            
+            return product_data
             
         except Exception as e:
-            logger.error(f"Error getting product details: {e}")
+            logger.error("Error getting product details: %s", e)
             return None
     
     async def get_sku_details(self, product_id: str, sku_id: str) -> Optional[Dict[str, Any]]:
@@ -173,13 +292,13 @@ class AliExpressAPI:
                 params
             )
             
-            if response and 'aliexpress_affiliate_product_sku_detail_get_response' in response:
-                return response['aliexpress_affiliate_product_sku_detail_get_response']['result']
+            if not response:
+                return None
             
-            return None
+            return response.get(SKU_DETAIL_RESP, _EMPTY).get('result')
             
         except Exception as e:
-            logger.error(f"Error getting SKU details: {e}")
+            logger.error("Error getting SKU details: %s", e)
             return None
     
     async def get_shipping_info(self, product_id: str) -> Optional[Dict[str, Any]]:
@@ -197,13 +316,13 @@ class AliExpressAPI:
                 params
             )
             
-            if response and 'aliexpress_affiliate_product_shipping_get_response' in response:
-                return response['aliexpress_affiliate_product_shipping_get_response']['result']
+            if not response:
+                return None
             
-            return None
+            return response.get(SHIPPING_RESP, _EMPTY).get('result')
             
         except Exception as e:
-            logger.error(f"Error getting shipping info: {e}")
+            logger.error("Error getting shipping info: %s", e)
             return None
     
     async def search_products(self, keywords: str, page_size: int = 10) -> Optional[Dict[str, Any]]:
@@ -224,15 +343,13 @@ class AliExpressAPI:
                 params
             )
             
-            if response and 'aliexpress_affiliate_product_query_response' in response:
-
-                return response['aliexpress_affiliate_product_query_response']['result']
-
+            if not response:
+                return None
             
-            return None
+            return response.get(PRODUCT_QUERY_RESP, _EMPTY).get('result')
             
         except Exception as e:
-            logger.error(f"Error searching products: {e}")
+            logger.error("Error searching products: %s", e)
             return None
     
 
@@ -251,4 +368,36 @@ class AliExpressAPI:
             'subtotal': subtotal,
             'tax_amount': tax_amount,
             'total': total
-        }
\ No newline at end of file
+        }
+    
+    def calculate_total_prices(self, base_prices, shipping_costs=None) -> Dict[str, np.ndarray]:
+        """Vectorised calculate_total_price for a batch of items (dict of float64 arrays)"""
+        base = np.asarray(base_prices, dtype=np.float64)
+        if shipping_costs is None:
+            shipping = np.zeros_like(base)
+        else:
+            shipping = np.asarray(shipping_costs, dtype=np.float64)
+            # Broadcast both ways so every path returns the full batch shape;
+            # copies turn the broadcast views into ordinary writable arrays
+            if shipping.shape != base.shape:
+                base, shipping = (a.copy() for a in np.broadcast_arrays(base, shipping))
+        
+        if _calc_total_price_kernel is not None and base.ndim == 1 and base.size >= _NUMBA_MIN_BATCH:
+            base = np.ascontiguousarray(base)
+            shipping = np.ascontiguousarray(shipping)
+            subtotal = np.empty_like(base)
+            tax_amount = np.empty_like(base)
+            total = np.empty_like(base)
+            _calc_total_price_kernel(base, shipping, self.tax_rate, subtotal, tax_amount, total)
+        else:
+            subtotal = base + shipping
+            tax_amount = subtotal * self.tax_rate
+            total = subtotal + tax_amount
+        
+        return {
+            'base_price': base,
+            'shipping_cost': shipping,
+            'subtotal': subtotal,
+            'tax_amount': tax_amount,
+            'total': total
+        }
@@ -3,10 +3,22 @@ Simple script to help get AliExpress access token
 """
 
 import os
+import sys
+import asyncio
 from dotenv import load_dotenv
 from oauth_helper import AliExpressOAuth
 
-def main():
+BANNER = """🔑 AliExpress Access Token Generator
+{sep}
+
+Choose an option:
+1. Generate authorization URL (for new token)
+2. Exchange authorization code for token
+3. Refresh existing token
+
+""".format(sep="=" * 50)
+
+async def main():
     # Load environment variables
     load_dotenv()
     
@@ -19,18 +31,11 @@ def main():
         print("Please add them first before running this script.")
         return
     
-    print("🔑 AliExpress Access Token Generator")
-    print("=" * 50)
-    print()
+    sys.stdout.write(BANNER)
+    sys.stdout.flush()
     
     oauth = AliExpressOAuth()
     
-    print("Choose an option:")
-    print("1. Generate authorization URL (for new token)")
-    print("2. Exchange authorization code for token")
-    print("3. Refresh existing token")
-    print()
-    
     choice = input("Enter your choice (1-3): ").strip()
     
     if choice == "1":
@@ -43,17 +48,21 @@ def main():
         auth_code = input("\n🔐 Enter the authorization code: ").strip()
         if auth_code:
             print("🔄 Exchanging code for access token...")
-            token_data = oauth.exchange_code_for_token(auth_code)
+            async with oauth:
+                token_data = await oauth.exchange_code_for_token(auth_code)
             
             if token_data:
-                print("\n✅ Success! Your tokens:")
-                print(f"Access Token: {token_data['access_token']}")
-                print(f"Refresh Token: {token_data['refresh_token']}")
-                print(f"Expires In: {token_data['expires_in']} seconds")
-                print()
-                print("📝 Add these to your .env file:")
-                print(f"ALIEXPRESS_ACCESS_TOKEN={token_data['access_token']}")
-                print(f"ALIEXPRESS_REFRESH_TOKEN={token_data['refresh_token']}")
+                sys.stdout.write(
+                    f"\n✅ Success! Your tokens:\n"
+                    f"Access Token: {token_data['access_token']}\n"
+                    f"Refresh Token: {token_data['refresh_token']}\n"
+                    f"Expires In: {token_data['expires_in']} seconds\n"
+                    f"\n"
+                    f"📝 Add these to your .env file:\n"
+                    f"ALIEXPRESS_ACCESS_TOKEN={token_data['access_token']}\n"
+                    f"ALIEXPRESS_REFRESH_TOKEN={token_data['refresh_token']}\n"
+                )
+                sys.stdout.flush()
             else:
                 print("\n❌ Failed to get access token.")
         else:
@@ -63,17 +72,21 @@ def main():
         refresh_token = input("\n🔄 Enter your refresh token: ").strip()
         if refresh_token:
             print("🔄 Refreshing access token...")
-            token_data = oauth.refresh_access_token(refresh_token)
+            async with oauth:
+                token_data = await oauth.refresh_access_token(refresh_token)
             
             if token_data:
-                print("\n✅ Token refreshed successfully!")
-                print(f"New Access Token: {token_data['access_token']}")
-                print(f"New Refresh Token: {token_data['refresh_token']}")
-                print(f"Expires In: {token_data['expires_in']} seconds")
-                print()
-                print("📝 Update your .env file:")
-                print(f"ALIEXPRESS_ACCESS_TOKEN={token_data['access_token']}")
-                print(f"ALIEXPRESS_REFRESH_TOKEN={token_data['refresh_token']}")
+                sys.stdout.write(
+                    f"\n✅ Token refreshed successfully!\n"
+                    f"New Access Token: {token_data['access_token']}\n"
+                    f"New Refresh Token: {token_data['refresh_token']}\n"
+                    f"Expires In: {token_data['expires_in']} seconds\n"
+                    f"\n"
+                    f"📝 Update your .env file:\n"
+                    f"ALIEXPRESS_ACCESS_TOKEN={token_data['access_token']}\n"
+                    f"ALIEXPRESS_REFRESH_TOKEN={token_data['refresh_token']}\n"
+                )
+                sys.stdout.flush()
             else:
                 print("\n❌ Failed to refresh token.")
         else:
@@ -83,4 +96,4 @@ def main():
         print("Invalid choice.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -3,127 +3,128 @@ AliExpress Link Parser
 Handles parsing and extraction of product information from AliExpress URLs
 """
 
-import re
+import functools
 import logging
-from urllib.parse import urlparse, parse_qs
-from typing import Optional, Dict
+try:
+    import re2 as re  # linear-time DFA engine with the same API as re
+except ImportError:  # google-re2 is optional, fall back to the stdlib engine
+    import re
+from urllib.parse import urlsplit, urlunsplit, parse_qs, parse_qsl, urlencode, SplitResult
+from types import MappingProxyType
+from typing import Optional, Mapping, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Common SKU parameter names, in lookup priority order
+_SKU_PARAM_ORDER = ('sku', 'skuId', 'sku_id', 'variation')
+_SKU_PARAMS = frozenset(_SKU_PARAM_ORDER)
+
+# Hosts accepted by is_aliexpress_url (after stripping 'www.')
+_ALIEXPRESS_HOSTS = frozenset(('aliexpress.com', 'm.aliexpress.com', 'a.aliexpress.com'))
+
+# Query parameters stripped by clean_url
+_TRACKING_PARAMS = frozenset((
+    'spm', 'scm', '_t', 'algo_pvid', 'algo_expid', 'btsid',
+    'ws_ab_test', 'pvid', 'ptl', 'utm_source', 'utm_medium',
+    'utm_campaign', 'utm_content', 'utm_term'
+))
+
+# Product URL patterns, matched against the URL path only. parse_url picks at
+# most one of them from the path prefix (or short-link host), so URLs that are
+# not product links never reach the regex engine. Compiled once at import so
+# they never depend on the re module's pattern cache.
+# Desktop and mobile: /item/<id>.html or /item/<slug>/<id>.html
+_RE_ITEM_PATH = re.compile(r'/item/(?:(?P<slug>[^/]+)/)?(?P<product_id>\d+)\.html')
+# Store item: /store/product/<name>/<store_id>_<product_id>.html
+_RE_STORE_PATH = re.compile(r'/store/product/[^/]+/(?P<store_id>\d+)_(?P<product_id>\d+)\.html')
+# Short link on a.aliexpress.com: /_<code>
+_RE_SHORT_PATH = re.compile(r'/_(?P<short_code>[a-zA-Z0-9]+)')
+
 class AliExpressLinkParser:
     def __init__(self):
-        # Regex patterns for different AliExpress URL formats
-        self.patterns = {
-            # Standard desktop URLs
-            'desktop': re.compile(r'(?:https?://)?(?:www\.)?aliexpress\.com/item/([^/]+)/(\d+)\.html'),
-            'desktop_alt': re.compile(r'(?:https?://)?(?:www\.)?aliexpress\.com/item/(\d+)\.html'),
-            
-            # Mobile URLs
-            'mobile': re.compile(r'(?:https?://)?(?:m\.)?aliexpress\.com/item/(\d+)\.html'),
-            
-            # Short URLs
-            'short': re.compile(r'(?:https?://)?a\.aliexpress\.com/_([a-zA-Z0-9]+)'),
-            
-            # App URLs
-            'app': re.compile(r'(?:https?://)?(?:www\.)?aliexpress\.com/item/([^/\?]+)'),
-            
-            # Store item URLs
-            'store': re.compile(r'(?:https?://)?(?:www\.)?aliexpress\.com/store/product/[^/]+/(\d+)_(\d+)\.html'),
-        }
-        
-        self.aliexpress_domains = [
-            'aliexpress.com',
-            'www.aliexpress.com',
-            'm.aliexpress.com',
-            'a.aliexpress.com'
-        ]
+        # Users often resend the same links; memoize parsing per URL
+        self._parse_url_cached = functools.lru_cache(maxsize=4096)(self._parse_url)
     
-    def is_aliexpress_url(self, url: str) -> bool:
-        """Check if the URL is from AliExpress"""
+    def _split(self, url: str) -> Optional[Tuple[str, SplitResult]]:
+        """Split the URL once; returns (domain, parts) for AliExpress URLs, else None"""
+        # Cheap substring reject for ordinary chat messages before any URL parsing
+        if 'aliexpress' not in url.lower():
+            return None
+        
         try:
-            parsed = urlparse(url)
-            domain = parsed.netloc.lower()
+            parts = urlsplit(url)
+            # hostname is already lower-cased, without port or userinfo
+            domain = parts.hostname or ''
             
             # Remove 'www.' prefix if present
             if domain.startswith('www.'):
                 domain = domain[4:]
             
-            return domain in ['aliexpress.com', 'm.aliexpress.com', 'a.aliexpress.com']
+            if domain not in _ALIEXPRESS_HOSTS:
+                return None
+            return domain, parts
         except Exception as e:
-            logger.error(f"Error checking URL domain: {e}")
-            return False
+            logger.error("Error checking URL domain: %s", e)
+            return None
     
-    def parse_url(self, url: str) -> Optional[Dict[str, str]]:
+    def is_aliexpress_url(self, url: str) -> bool:
+        """Check if the URL is from AliExpress"""
+        return self._split(url) is not None
+    
+    def parse_url(self, url: str) -> Optional[Mapping[str, str]]:
         """
         Parse AliExpress URL and extract product information
-        Returns dict with product_id and optionally sku_id
+        Returns a read-only mapping with product_id and optionally sku_id
         """
-        if not self.is_aliexpress_url(url):
+        return self._parse_url_cached(url)
+    
+    def _parse_url(self, url: str) -> Optional[Mapping[str, str]]:
+        """Uncached parse_url; results are shared between callers, hence read-only"""
+        split = self._split(url)
+        if split is None:
             return None
+        domain, parts = split
         
         try:
-            # Normalize URL
-            if not url.startswith(('http://', 'https://')):
-                url = 'https://' + url
-            
-            # Try different patterns
+            # Dispatch on the path prefix so at most one pattern runs
             product_info = None
+            path = parts.path
             
-            # Desktop pattern with product name and ID
-            match = self.patterns['desktop'].search(url)
-            if match:
-                product_info = {
-                    'product_id': match.group(2),
-                    'product_name_slug': match.group(1)
-                }
-            
-            # Desktop alternative pattern
-            if not product_info:
-                match = self.patterns['desktop_alt'].search(url)
+            if path.startswith('/item/'):
+                match = _RE_ITEM_PATH.match(path)
                 if match:
                     product_info = {
-                        'product_id': match.group(1)
+                        'product_id': match.group('product_id')
                     }
-            
-            # Mobile pattern
-            if not product_info:
-                match = self.patterns['mobile'].search(url)
+                    if match.group('slug'):
+                        product_info['product_name_slug'] = match.group('slug')
+            elif path.startswith('/store/product/'):
+                match = _RE_STORE_PATH.match(path)
                 if match:
                     product_info = {
-                        'product_id': match.group(1)
+                        'product_id': match.group('product_id'),
+                        'store_id': match.group('store_id')
                     }
-            
-            # Store pattern
-            if not product_info:
-                match = self.patterns['store'].search(url)
-                if match:
-                    product_info = {
-                        'product_id': match.group(2),
-                        'store_id': match.group(1)
-                    }
-            
-            # Short URL pattern (requires expansion)
-            if not product_info:
-                match = self.patterns['short'].search(url)
+            elif domain == 'a.aliexpress.com':
+                match = _RE_SHORT_PATH.match(path)
                 if match:
+                    # Short URL pattern (requires expansion)
                     # For short URLs, we'll need to follow redirects
                     # This is a simplified approach
                     product_info = {
-                        'short_code': match.group(1),
+                        'short_code': match.group('short_code'),
                         'needs_expansion': True
                     }
             
             # Extract SKU ID from query parameters if present
             if product_info:
-                parsed_url = urlparse(url)
-                query_params = parse_qs(parsed_url.query)
+                query_params = parse_qs(parts.query)
                 
-                # Common SKU parameter names
-                sku_params = ['sku', 'skuId', 'sku_id', 'variation']
-                for param in sku_params:
-                    if param in query_params:
-                        product_info['sku_id'] = query_params[param][0]
-                        break
+                sku_keys = _SKU_PARAMS & query_params.keys()
+                if sku_keys:
+                    # Several SKU params in one URL is rare; keep priority order then
+                    sku_key = min(sku_keys, key=_SKU_PARAM_ORDER.index) if len(sku_keys) > 1 else next(iter(sku_keys))
+                    product_info['sku_id'] = query_params[sku_key][0]
                 
                 # Extract other useful parameters
                 if 'spm' in query_params:
@@ -133,14 +134,14 @@ class AliExpressLinkParser:
                     product_info['scm'] = query_params['scm'][0]
             
             if product_info:
-                logger.info(f"Successfully parsed URL: {product_info}")
-                return product_info
+                logger.info("Successfully parsed URL: %s", product_info)
+                return MappingProxyType(product_info)
             else:
-                logger.warning(f"Could not parse AliExpress URL: {url}")
+                logger.warning("Could not parse AliExpress URL: %s", url)
                 return None
                 
         except Exception as e:
-            logger.error(f"Error parsing URL {url}: {e}")
+            logger.error("Error parsing URL %s: %s", url, e)
             return None
     
     def extract_product_id_from_redirect(self, url: str) -> Optional[str]:
@@ -150,43 +151,26 @@ class AliExpressLinkParser:
         """
         # This would require making HTTP requests to follow redirects
         # For now, return None and let the calling code handle it
-        logger.warning(f"Redirect following not implemented for URL: {url}")
+        logger.warning("Redirect following not implemented for URL: %s", url)
         return None
     
     def validate_product_id(self, product_id: str) -> bool:
         """Validate that the product ID is in the correct format"""
-        try:
-            # AliExpress product IDs are typically numeric and quite long
-            return product_id.isdigit() and len(product_id) >= 8
-        except:
-            return False
+        # AliExpress product IDs are typically numeric and quite long
+        return isinstance(product_id, str) and len(product_id) >= 8 and product_id.isdigit()
     
     def clean_url(self, url: str) -> str:
         """Clean and normalize AliExpress URL"""
         try:
-            # Remove tracking parameters
-            tracking_params = [
-                'spm', 'scm', '_t', 'algo_pvid', 'algo_expid', 'btsid',
-                'ws_ab_test', 'pvid', 'ptl', 'utm_source', 'utm_medium',
-                'utm_campaign', 'utm_content', 'utm_term'
-            ]
+            parsed = urlsplit(url)
             
-            parsed = urlparse(url)
-            query_params = parse_qs(parsed.query)
-            
-            # Remove tracking parameters
-            cleaned_params = {k: v for k, v in query_params.items() 
-                            if k not in tracking_params}
-            
-            # Reconstruct URL
-            if cleaned_params:
-                query_string = '&'.join([f"{k}={v[0]}" for k, v in cleaned_params.items()])
-                cleaned_url = f"{parsed.scheme}://{parsed.netloc}{parsed.path}?{query_string}"
-            else:
-                cleaned_url = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
+            # Remove tracking parameters in a single pass
+            kept = [(k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+                    if k not in _TRACKING_PARAMS]
             
-            return cleaned_url
+            # Reconstruct URL (fragment dropped)
+            return urlunsplit((parsed.scheme, parsed.netloc, parsed.path, urlencode(kept), ''))
             
         except Exception as e:
-            logger.error(f"Error cleaning URL: {e}")
-            return url
\ No newline at end of file
+            logger.error("Error cleaning URL: %s", e)
+            return url
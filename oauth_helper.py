@@ -4,35 +4,77 @@ Helps generate access tokens for user authorization
 """
 
 import os
+import logging
 import hashlib
+import json
+import secrets
 import time
 import urllib.parse
-import requests
-from typing import Optional, Dict, Any
+import asyncio
+import aiohttp
+from typing import Optional, Dict, Any, Tuple
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional, fall back to stdlib json
+    _json_loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+# Signed parameter names of each token request, already in sign order
+_TOKEN_KEYS = ('app_key', 'code', 'format', 'method', 'redirect_uri', 'sign_method', 'timestamp', 'v')
+_REFRESH_KEYS = ('app_key', 'format', 'method', 'refresh_token', 'sign_method', 'timestamp', 'v')
 
 class AliExpressOAuth:
     def __init__(self):
         self.app_key = os.getenv('ALIEXPRESS_APP_KEY')
         self.app_secret = os.getenv('ALIEXPRESS_APP_SECRET')
+        self._app_secret_b = (self.app_secret or '').encode('utf-8')
         self.redirect_uri = os.getenv('REDIRECT_URI', 'http://localhost:8080/callback')
         self.base_url = 'https://api.aliexpress.com/sync'
+        self._session = None
         
-    def get_authorization_url(self) -> str:
-        """Generate authorization URL for OAuth flow"""
-        params = {
-            'response_type': 'code',
-            'client_id': self.app_key,
-            'redirect_uri': self.redirect_uri,
-            'state': 'random_state_string'  # Use a random string in production
-        }
+        # Everything but the state is fixed per instance; render it once
+        self._auth_prefix = (
+            'https://api.aliexpress.com/oauth/authorize?response_type=code'
+            f'&client_id={urllib.parse.quote_plus(str(self.app_key))}'
+            f'&redirect_uri={urllib.parse.quote_plus(self.redirect_uri)}'
+            '&state='
+        )
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Get or create the pooled aiohttp session"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=32, ttl_dns_cache=300)
+            )
+        return self._session
+    
+    async def close(self):
+        """Close the aiohttp session"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+    
+    def get_authorization_url(self, state: Optional[str] = None) -> str:
+        """Generate authorization URL for OAuth flow
         
-        auth_url = f"https://api.aliexpress.com/oauth/authorize?{urllib.parse.urlencode(params)}"
-        return auth_url
+        A random state nonce is generated unless the caller passes its own.
+        """
+        if state is None:
+            state = secrets.token_urlsafe(16)
+        return self._auth_prefix + urllib.parse.quote_plus(state)
     
-    def exchange_code_for_token(self, authorization_code: str) -> Optional[Dict[str, Any]]:
+    async def exchange_code_for_token(self, authorization_code: str) -> Optional[Dict[str, Any]]:
         """Exchange authorization code for access token"""
         try:
-            timestamp = str(int(time.time() * 1000))
+            timestamp = str(time.time_ns() // 1_000_000)
             
             params = {
                 'app_key': self.app_key,
@@ -46,31 +88,32 @@ class AliExpressOAuth:
             }
             
             # Generate signature
-            params['sign'] = self._generate_signature(params)
+            params['sign'] = self._generate_signature(params, _TOKEN_KEYS)
             
-            response = requests.post(self.base_url, data=params)
+            session = self._get_session()
             
-            if response.status_code == 200:
-                result = response.json()
-                if 'aliexpress_system_oauth_token_response' in result:
-                    token_data = result['aliexpress_system_oauth_token_response']
-                    return {
-                        'access_token': token_data.get('access_token'),
-                        'refresh_token': token_data.get('refresh_token'),
-                        'expires_in': token_data.get('expires_in'),
-                        'token_type': token_data.get('token_type')
-                    }
+            async with session.post(self.base_url, data=params) as response:
+                if response.status == 200:
+                    result = _json_loads(await response.read())
+                    if 'aliexpress_system_oauth_token_response' in result:
+                        token_data = result['aliexpress_system_oauth_token_response']
+                        return {
+                            'access_token': token_data.get('access_token'),
+                            'refresh_token': token_data.get('refresh_token'),
+                            'expires_in': token_data.get('expires_in'),
+                            'token_type': token_data.get('token_type')
+                        }
             
             return None
             
         except Exception as e:
-            print(f"Error exchanging code for token: {e}")
+            logger.error("Error exchanging code for token: %s", e)
             return None
     
-    def refresh_access_token(self, refresh_token: str) -> Optional[Dict[str, Any]]:
+    async def refresh_access_token(self, refresh_token: str) -> Optional[Dict[str, Any]]:
         """Refresh an expired access token"""
         try:
-            timestamp = str(int(time.time() * 1000))
+            timestamp = str(time.time_ns() // 1_000_000)
             
             params = {
                 'app_key': self.app_key,
@@ -83,44 +126,49 @@ class AliExpressOAuth:
             }
             
             # Generate signature
-            params['sign'] = self._generate_signature(params)
+            params['sign'] = self._generate_signature(params, _REFRESH_KEYS)
             
-            response = requests.post(self.base_url, data=params)
+            session = self._get_session()
             
-            if response.status_code == 200:
-                result = response.json()
-                if 'aliexpress_system_oauth_token_refresh_response' in result:
-                    token_data = result['aliexpress_system_oauth_token_refresh_response']
-                    return {
-                        'access_token': token_data.get('access_token'),
-                        'refresh_token': token_data.get('refresh_token'),
-                        'expires_in': token_data.get('expires_in'),
-                        'token_type': token_data.get('token_type')
-                    }
+            async with session.post(self.base_url, data=params) as response:
+                if response.status == 200:
+                    result = _json_loads(await response.read())
+                    if 'aliexpress_system_oauth_token_refresh_response' in result:
+                        token_data = result['aliexpress_system_oauth_token_refresh_response']
+                        return {
+                            'access_token': token_data.get('access_token'),
+                            'refresh_token': token_data.get('refresh_token'),
+                            'expires_in': token_data.get('expires_in'),
+                            'token_type': token_data.get('token_type')
+                        }
             
             return None
             
         except Exception as e:
-            print(f"Error refreshing token: {e}")
+            logger.error("Error refreshing token: %s", e)
             return None
     
-    def _generate_signature(self, params: Dict[str, Any]) -> str:
-        """Generate API signature for AliExpress API"""
-        # Sort parameters by key
-        sorted_params = sorted(params.items())
+    def _generate_signature(self, params: Dict[str, Any], keys: Optional[Tuple[str, ...]] = None) -> str:
+        """Generate API signature for AliExpress API
         
-        # Create parameter string
-        param_string = ''.join([f"{k}{v}" for k, v in sorted_params])
+        keys, when given, must list every key of params in sorted order.
+        """
+        if keys is None:
+            keys = sorted(params)
         
-        # Add app secret at the beginning and end
-        sign_string = f"{self.app_secret}{param_string}{self.app_secret}"
+        # MD5 is mandated by the API wire format and has no security role here
+        h = hashlib.md5(usedforsecurity=False)
         
-        # Generate MD5 hash
-        signature = hashlib.md5(sign_string.encode('utf-8')).hexdigest().upper()
+        # App secret at the beginning and end, sorted key/value pairs in between
+        h.update(self._app_secret_b)
+        for k in keys:
+            h.update(k.encode('utf-8'))
+            h.update(str(params[k]).encode('utf-8'))
+        h.update(self._app_secret_b)
         
-        return signature
+        return h.hexdigest().upper()
 
-def main():
+async def main():
     """Helper script to get access token"""
     oauth = AliExpressOAuth()
     
@@ -143,7 +191,8 @@ def main():
     if auth_code:
         # Step 3: Exchange code for token
         print("\n4. Exchanging code for access token...")
-        token_data = oauth.exchange_code_for_token(auth_code)
+        async with oauth:
+            token_data = await oauth.exchange_code_for_token(auth_code)
         
         if token_data:
             print("\n✅ Success! Your access token:")
@@ -161,4 +210,4 @@ def main():
         print("No authorization code provided.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -16,6 +16,56 @@ from formatter import ArabicFormatter
 
 logger = logging.getLogger(__name__)
 
+# Fixed reply texts, built once at import
+_WELCOME_TEXT = """
+🛍️ **مرحباً بك في بوت معلومات منتجات علي إكسبريس!**
+
+أرسل لي رابط أي منتج من علي إكسبريس وسأقوم بإرسال معلومات مفصلة عن المنتج باللغة العربية.
+
+**الميزات:**
+• معلومات المنتج مع الصور
+• الأسعار بالدولار الأمريكي
+• تكلفة الشحن إلى الجزائر
+• تقييمات العملاء
+• معلومات البائع
+• المتغيرات المتاحة (الألوان، الأحجام)
+
+ما عليك سوى إرسال رابط المنتج وسأتولى الباقي! 📦
+        """
+
+_HELP_TEXT = """
+🔗 **كيفية استخدام البوت:**
+
+1. انسخ رابط أي منتج من علي إكسبريس
+2. ألصق الرابط في المحادثة
+3. انتظر حتى أحضر لك المعلومات
+
+**أمثلة على الروابط المدعومة:**
+• https://www.aliexpress.com/item/...
+• https://a.aliexpress.com/_mNvN...
+• https://m.aliexpress.com/item/...
+
+**ملاحظة:** 📋
+• يتم عرض الأسعار بالدولار الأمريكي
+• تكلفة الشحن محسوبة للجزائر
+• المعلومات محدثة في الوقت الفعلي
+
+إذا واجهت أي مشاكل، تأكد من أن الرابط صحيح ومن علي إكسبريس.
+        """
+
+_BAD_URL_TEXT = """
+❌ **رابط غير صحيح**
+
+يرجى إرسال رابط صحيح من علي إكسبريس.
+
+**أمثلة على الروابط الصحيحة:**
+• https://www.aliexpress.com/item/...
+• https://a.aliexpress.com/_mNvN...
+• https://m.aliexpress.com/item/...
+            """
+
+_PROCESSING_TEXT = "🔄 **جاري تحليل الرابط وجلب معلومات المنتج...**\nيرجى الانتظار قليلاً..."
+
 class TelegramBot:
     def __init__(self):
         self.token = os.getenv('TELEGRAM_BOT_TOKEN')
@@ -46,51 +96,15 @@ class TelegramBot:
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
-        welcome_text = """
-🛍️ **مرحباً بك في بوت معلومات منتجات علي إكسبريس!**
-
-أرسل لي رابط أي منتج من علي إكسبريس وسأقوم بإرسال معلومات مفصلة عن المنتج باللغة العربية.
-
-**الميزات:**
-• معلومات المنتج مع الصور
-• الأسعار بالدولار الأمريكي
-• تكلفة الشحن إلى الجزائر
-• تقييمات العملاء
-• معلومات البائع
-• المتغيرات المتاحة (الألوان، الأحجام)
-
-ما عليك سوى إرسال رابط المنتج وسأتولى الباقي! 📦
-        """
-        
         await update.message.reply_text(
-            welcome_text, 
+            _WELCOME_TEXT,
             parse_mode=ParseMode.MARKDOWN
         )
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /help command"""
-        help_text = """
-🔗 **كيفية استخدام البوت:**
-
-1. انسخ رابط أي منتج من علي إكسبريس
-2. ألصق الرابط في المحادثة
-3. انتظر حتى أحضر لك المعلومات
-
-**أمثلة على الروابط المدعومة:**
-• https://www.aliexpress.com/item/...
-• https://a.aliexpress.com/_mNvN...
-• https://m.aliexpress.com/item/...
-
-**ملاحظة:** 📋
-• يتم عرض الأسعار بالدولار الأمريكي
-• تكلفة الشحن محسوبة للجزائر
-• المعلومات محدثة في الوقت الفعلي
-
-إذا واجهت أي مشاكل، تأكد من أن الرابط صحيح ومن علي إكسبريس.
-        """
-        
         await update.message.reply_text(
-            help_text,
+            _HELP_TEXT,
             parse_mode=ParseMode.MARKDOWN
         )
     
@@ -100,25 +114,15 @@ class TelegramBot:
         
         # Check if message contains AliExpress URL
         if not self.link_parser.is_aliexpress_url(message_text):
-            error_message = """
-❌ **رابط غير صحيح**
-
-يرجى إرسال رابط صحيح من علي إكسبريس.
-
-**أمثلة على الروابط الصحيحة:**
-• https://www.aliexpress.com/item/...
-• https://a.aliexpress.com/_mNvN...
-• https://m.aliexpress.com/item/...
-            """
             await update.message.reply_text(
-                error_message,
+                _BAD_URL_TEXT,
                 parse_mode=ParseMode.MARKDOWN
             )
             return
         
         # Send processing message
         processing_message = await update.message.reply_text(
-            "🔄 **جاري تحليل الرابط وجلب معلومات المنتج...**\nيرجى الانتظار قليلاً..."
+            _PROCESSING_TEXT
         )
         
         try:
@@ -131,10 +135,15 @@ class TelegramBot:
                 )
                 return
             
-            # Fetch product details from AliExpress API
-            product_data = await self.api.get_product_details(
-                product_info['product_id'],
-                product_info.get('sku_id')
+            # Fetch product details and shipping information concurrently
+            product_data, shipping_data = await asyncio.gather(
+                self.api.get_product_details(
+                    product_info['product_id'],
+                    product_info.get('sku_id')
+                ),
+                self.api.get_shipping_info(
+                    product_info['product_id']
+                )
             )
             
             if not product_data:
@@ -143,11 +152,6 @@ class TelegramBot:
                 )
                 return
             
-            # Get shipping information
-            shipping_data = await self.api.get_shipping_info(
-                product_info['product_id']
-            )
-            
             # Format the response in Arabic
             formatted_response = self.formatter.format_product_info(
                 product_data, 
@@ -159,21 +163,19 @@ class TelegramBot:
                 # Split message into chunks
                 chunks = self.formatter.split_message(formatted_response)
                 
-                await processing_message.delete()
+                # Reuse the processing message for the first chunk
+                await processing_message.edit_text(
+                    chunks[0],
+                    parse_mode=ParseMode.MARKDOWN,
+                    disable_web_page_preview=False
+                )
                 
-                for i, chunk in enumerate(chunks):
-                    if i == 0:
-                        await update.message.reply_text(
-                            chunk,
-                            parse_mode=ParseMode.MARKDOWN,
-                            disable_web_page_preview=False
-                        )
-                    else:
-                        await update.message.reply_text(
-                            chunk,
-                            parse_mode=ParseMode.MARKDOWN,
-                            disable_web_page_preview=True
-                        )
+                for chunk in chunks[1:]:
+                    await update.message.reply_text(
+                        chunk,
+                        parse_mode=ParseMode.MARKDOWN,
+                        disable_web_page_preview=True
+                    )
             else:
                 await processing_message.edit_text(
                     formatted_response,
@@ -182,7 +184,7 @@ class TelegramBot:
                 )
                 
         except Exception as e:
-            logger.error(f"Error processing message: {e}")
+            logger.error("Error processing message: %s", e)
             await processing_message.edit_text(
                 f"❌ **خطأ في المعالجة**\nحدث خطأ أثناء معالجة طلبك: {str(e)}\n\nيرجى المحاولة مرة أخرى أو التحقق من صحة الرابط."
             )
@@ -192,4 +194,5 @@ class TelegramBot:
         if self.application:
             await self.application.stop()
             await self.application.shutdown()
-            logger.info("Bot stopped successfully!")
\ No newline at end of file
+        await self.api.close()
+        logger.info("Bot stopped successfully!")
\ No newline at end of file